@@ -1,6 +1,16 @@
 from __future__ import print_function,absolute_import
 
 import sys, os, re
+import mmap, glob, time, hashlib
+import multiprocessing
+from collections import defaultdict, OrderedDict
+from array import array
+
+try:
+	array("q")
+	INT64 = "q"
+except ValueError:
+	INT64 = "l" # python 2 has no long long typecode
 
 def day1_part1(input_file):
 	freq = 0
@@ -21,6 +31,161 @@ def day1_part2(input_file):
 				return freq
 			freqs_seen.add(freq)
 
+def iter_chunk_bytes(input_file, chunk_size=1<<16):
+	# memory-maps the input and yields it as byte strings of roughly chunk_size bytes, each cut at the last
+	# newline within the window so that no number is split across two chunks. memory use is bounded by the
+	# chunk size, not the file size; small chunks keep the per-chunk token lists cache-sized.
+	with open(input_file, "rb") as f:
+		if os.fstat(f.fileno()).st_size == 0:
+			return
+		buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		try:
+			start = 0
+			dropped = 0 # pages before this offset have been released
+			end_of_file = len(buf)
+			while start < end_of_file:
+				end = min(start + chunk_size, end_of_file)
+				if end < end_of_file:
+					nl = buf.rfind(b"\n", start, end)
+					if nl < 0:
+						# a single line longer than the chunk size; extend to the next newline instead
+						nl = buf.find(b"\n", end)
+						if nl < 0: nl = end_of_file - 1
+					end = nl + 1
+				yield buf[start:end]
+				if hasattr(buf, "madvise"):
+					# drop the pages already parsed, so that the mapping's resident size stays flat too
+					done = end - end % mmap.PAGESIZE
+					if done > dropped:
+						buf.madvise(mmap.MADV_DONTNEED, dropped, done - dropped)
+						dropped = done
+				start = end
+		finally:
+			buf.close()
+
+def iter_change_chunks(input_file, chunk_size=1<<16):
+	# the frequency changes in the input, as typed arrays of signed 64-bit ints, one per chunk
+	for chunk in iter_chunk_bytes(input_file, chunk_size):
+		yield array(INT64, map(int, chunk.split()))
+
+def day1_part1_mmap(input_file, chunk_size=1<<16):
+	# equivalent to day1_part1, but parses and sums each chunk in a single C-level map/sum instead of
+	# going through the interpreter loop once per line; no intermediate array is needed for the total
+	return sum(sum(map(int, chunk.split())) for chunk in iter_chunk_bytes(input_file, chunk_size))
+
+def first_repeated_frequency(changes):
+	# finds the same answer as day1_part2's brute-force replay, but from a single pass of prefix sums.
+	#
+	# let s[0..n-1] be the frequencies reached during the first pass, and D the drift per pass (= s[n-1]).
+	# the frequency reached at step k is then s[k % n] + (k // n)*D, so a frequency s[j] from the first pass
+	# reappears p passes later only as s[i] for some i with s[i] == s[j] + p*D, i.e. only if s[i] and s[j]
+	# share the same residue modulo D. within each residue class sorted by value, the earliest repeat
+	# reached from s[j] is its nearest neighbour in the direction of the drift, at step p*n + j.
+	sums = []
+	freq = 0
+	for change in changes:
+		freq += change
+		sums.append(freq)
+	if not sums:
+		return None
+	n = len(sums)
+	drift = sums[-1]
+	
+	# a frequency that repeats within the first pass always wins, as it happens before step n
+	first_index = {} # freq -> index of first occurrence
+	for j, freq in enumerate(sums):
+		if freq in first_index:
+			return freq
+		first_index[freq] = j
+	if drift == 0:
+		return sums[0] # second pass simply replays the first, so its first step is the first repeat
+	
+	groups = defaultdict(list) # residue -> frequencies
+	for freq in sums:
+		groups[freq % abs(drift)].append(freq)
+	
+	best = None # (passes, index, freq)
+	for group in groups.values():
+		group.sort(reverse=(drift < 0))
+		for lower, upper in zip(group, group[1:]):
+			# 'lower' is the start of the chain, 'upper' the first value it reaches further along the drift
+			candidate = ((upper - lower) // drift, first_index[lower], upper)
+			if best is None or candidate < best:
+				best = candidate
+	
+	return best[2] if best else None
+
+def day1_part2_closed_form(input_file):
+	changes = (change for chunk in iter_change_chunks(input_file) for change in chunk)
+	return first_repeated_frequency(changes)
+
+def _file_digest(input_file, block_size=1<<20):
+	h = hashlib.sha1()
+	with open(input_file, "rb") as f:
+		for block in iter(lambda: f.read(block_size), b""):
+			h.update(block)
+	return h.hexdigest()
+
+def _solve_batch_file(args):
+	# worker entry point for day1_batch; must live at module level so the pool can pickle it.
+	# failures are returned as an error message rather than raised, so that one bad file does not
+	# abort the rest of the batch
+	key, input_file = args
+	start = time.time()
+	try:
+		part1 = day1_part1_mmap(input_file)
+		part2 = day1_part2_closed_form(input_file)
+	except Exception as e:
+		return key, None, None, time.time() - start, "%s: %s" % (type(e).__name__, e)
+	return key, part1, part2, time.time() - start, None
+
+def day1_batch(inputs, processes=None):
+	# solves both parts for many input files at once, spreading them over a pool of worker processes.
+	# 'inputs' can be a directory (all files in it), a glob pattern, or a list of paths.
+	# yields (input_file, part1, part2, seconds, error) tuples in order of completion, where error is None on
+	# success, or a message (with part1 and part2 set to None) if the file could not be read or parsed.
+	# files with identical contents are only parsed once, and are all reported (with the same timing) when
+	# that one parse completes.
+	if isinstance(inputs, (list, tuple)):
+		input_files = list(inputs)
+	elif os.path.isdir(inputs):
+		input_files = sorted(os.path.join(inputs, name) for name in os.listdir(inputs))
+	else:
+		input_files = sorted(glob.glob(inputs))
+	input_files = [path for path in input_files if not os.path.isdir(path)]
+	
+	# files can only share content if they have the same size, so only those whose sizes collide are hashed
+	files_by_size = OrderedDict() # size -> paths of that size
+	for input_file in input_files:
+		try:
+			files_by_size.setdefault(os.path.getsize(input_file), []).append(input_file)
+		except (IOError, OSError) as e:
+			yield input_file, None, None, 0.0, "%s: %s" % (type(e).__name__, e)
+	files_by_content = OrderedDict() # (size, content digest or None if the size is unique) -> paths sharing that content
+	for size, paths in files_by_size.items():
+		if len(paths) == 1:
+			files_by_content[(size, None)] = paths
+			continue
+		for input_file in paths:
+			try:
+				files_by_content.setdefault((size, _file_digest(input_file)), []).append(input_file)
+			except (IOError, OSError) as e:
+				yield input_file, None, None, 0.0, "%s: %s" % (type(e).__name__, e)
+	if not files_by_content:
+		return
+	
+	jobs = [(key, paths[0]) for key, paths in files_by_content.items()]
+	pool = multiprocessing.Pool(processes)
+	try:
+		for key, part1, part2, elapsed, error in pool.imap_unordered(_solve_batch_file, jobs):
+			for input_file in files_by_content[key]:
+				yield input_file, part1, part2, elapsed, error
+	finally:
+		pool.terminate()
+		pool.join()
+
 if __name__ == "__main__":
 	print(day1_part1("day1.txt"))
-	print(day1_part2("day1.txt"))
\ No newline at end of file
+	print(day1_part2("day1.txt"))
+	print(day1_part1_mmap("day1.txt"))
+	print(day1_part2_closed_form("day1.txt"))
@@ -2,7 +2,7 @@ from __future__ import print_function,absolute_import
 import sys, os, re
 
 from pprint import pprint
-from collections import defaultdict
+from collections import defaultdict, deque
 
 def day2_part1(input_file):
 	with open(input_file, "r") as f:
@@ -19,6 +19,28 @@ def day2_part1(input_file):
 			three_count += 1
 	return two_count * three_count
 
+def day2_part1_matrix(input_file):
+	# same checksum as day2_part1, but without building a dict per line: all IDs are packed into a single
+	# fixed-width byte matrix (rows padded with NULs), and each row's letter histogram is taken with one
+	# C-level bytes.count call per letter of the alphabet actually in use.
+	with open(input_file, "rb") as f:
+		ids = f.read().split()
+	if not ids:
+		return 0
+	width = max(len(id) for id in ids)
+	matrix = b"".join(id.ljust(width, b"\0") for id in ids)
+	alphabet = [bytes(bytearray([c])) for c in sorted(set(bytearray(matrix)) - set([0]))]
+	
+	two_count = 0
+	three_count = 0
+	for offset in range(0, len(matrix), width):
+		histogram = set(map(matrix[offset:offset+width].count, alphabet))
+		if 2 in histogram:
+			two_count += 1
+		if 3 in histogram:
+			three_count += 1
+	return two_count * three_count
+
 def day2_part2(input_file):
 	with open(input_file, "r") as f:
 		lines = map(lambda line: line.strip(), f.readlines())
@@ -33,6 +55,108 @@ def day2_part2(input_file):
 				return "".join(split)
 			unique_splits[split] = line
 
+def _segment_bounds(length, num_segments):
+	return [(length*i//num_segments, length*(i+1)//num_segments) for i in range(0, num_segments)]
+
+def near_duplicate_pairs(ids, k=1):
+	# returns all pairs of (equal-length) IDs that differ in at most k positions, as sorted (index, index) pairs.
+	#
+	# by the pigeonhole principle, if each ID is cut into k+1 segments, two IDs with at most k mismatches
+	# must agree exactly on at least one segment. so we bucket IDs by (segment number, segment contents)
+	# and only compare IDs that share a bucket, rather than all pairs.
+	by_length = defaultdict(list) # length -> indices of IDs of that length
+	for index, id in enumerate(ids):
+		by_length[len(id)].append(index)
+	
+	pairs = []
+	for length, indices in by_length.items():
+		bounds = _segment_bounds(length, k+1)
+		buckets = defaultdict(list) # (segment number, segment) -> indices
+		for index in indices:
+			id = ids[index]
+			for s, (lo, hi) in enumerate(bounds):
+				buckets[(s, id[lo:hi])].append(index)
+		
+		for (s, _), bucket in buckets.items():
+			for x in range(0, len(bucket)):
+				a = ids[bucket[x]]
+				for y in range(x+1, len(bucket)):
+					b = ids[bucket[y]]
+					# a pair can share several segments; only check it in the bucket of the first one
+					if any(a[lo:hi] == b[lo:hi] for lo, hi in bounds[:s]):
+						continue
+					mismatches = 0
+					for ca, cb in zip(a, b):
+						if ca != cb:
+							mismatches += 1
+							if mismatches > k: break
+					if mismatches <= k:
+						pairs.append((bucket[x], bucket[y]))
+	
+	return sorted(pairs)
+
+def day2_part2_indexed(input_file):
+	with open(input_file, "r") as f:
+		lines = [line.strip() for line in f.readlines()]
+	for i, j in near_duplicate_pairs(lines, k=1):
+		if lines[i] != lines[j]:
+			return "".join(a for a, b in zip(lines[i], lines[j]) if a == b)
+
+class NearDuplicateStream(object):
+	# incremental version of day2_part2: IDs are added one at a time, and each new ID is checked against
+	# all earlier ones in O(L) lookups using the same (line[:i], line[i+1:]) deletion keys. two distinct IDs
+	# that differ in exactly one position share exactly one such key.
+	# if a window size is given, only the most recent 'window' IDs are kept in the index.
+	def __init__(self, window=None):
+		self.window = window
+		self.index = {} # deletion key -> deque of IDs producing that key, oldest first
+		self.ids = deque() # IDs currently in the index, oldest first
+	
+	@staticmethod
+	def _keys(id):
+		return [(id[:i], id[i+1:]) for i in range(0, len(id))]
+	
+	def add(self, id):
+		# inserts the given ID, and returns the list of earlier IDs (within the window) that are one edit away
+		matches = []
+		keys = self._keys(id)
+		for key in keys:
+			bucket = self.index.get(key)
+			if bucket is None:
+				bucket = deque()
+				self.index[key] = bucket
+			else:
+				matches.extend(other for other in bucket if other != id)
+			bucket.append(id)
+		
+		self.ids.append(id)
+		if self.window is not None and len(self.ids) > self.window:
+			self._evict()
+		return matches
+	
+	def _evict(self):
+		# since IDs are evicted in insertion order, the evicted ID is always at the front of its buckets
+		oldest = self.ids.popleft()
+		for key in self._keys(oldest):
+			bucket = self.index[key]
+			bucket.popleft()
+			if not bucket:
+				del self.index[key]
+	
+	def __len__(self):
+		return len(self.ids)
+
+def day2_part2_online(input_file, window=None):
+	stream = NearDuplicateStream(window)
+	with open(input_file, "r") as f:
+		for line in f:
+			line = line.strip()
+			for other in stream.add(line):
+				return "".join(a for a, b in zip(line, other) if a == b)
+
 if __name__ == "__main__":
 	print(day2_part1("day2.txt"))
-	print(day2_part2("day2.txt"))
\ No newline at end of file
+	print(day2_part1_matrix("day2.txt"))
+	print(day2_part2("day2.txt"))
+	print(day2_part2_indexed("day2.txt"))
+	print(day2_part2_online("day2.txt"))
\ No newline at end of file
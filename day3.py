@@ -1,49 +1,302 @@
 from __future__ import print_function,absolute_import
 import sys, os, re
 from collections import defaultdict, namedtuple
+from array import array
 
 Claim = namedtuple("Claim", "id left top width height")
+
+class Fabric(object):
+	# coverage counts for every square inch of a fabric, stored as a flat integer grid.
+	# built from a 2D difference array: each claim adds +1/-1 at its four corners, and
+	# a prefix sum over rows and then columns turns that into per-tile claim counts.
+	def __init__(self, columns):
+		# columns: (ids, lefts, tops, widths, heights), as returned by load_claim_columns
+		self.columns = columns
+		ids, lefts, tops, widths, heights = columns
+		self.width  = max([l + w for l, w in zip(lefts, widths)]  or [0])
+		self.height = max([t + h for t, h in zip(tops, heights)] or [0])
+		
+		stride = self.width + 1 # one extra row and column to hold the closing corners
+		grid = array("l", [0]) * (stride * (self.height + 1))
+		for left, top, width, height in zip(lefts, tops, widths, heights):
+			grid[top*stride + left] += 1
+			grid[top*stride + left + width] -= 1
+			grid[(top + height)*stride + left] -= 1
+			grid[(top + height)*stride + left + width] += 1
+		
+		for y in range(0, self.height + 1):
+			row = y*stride
+			for x in range(1, stride):
+				grid[row + x] += grid[row + x - 1]
+		for y in range(1, self.height + 1):
+			row = y*stride
+			for x in range(0, stride):
+				grid[row + x] += grid[row - stride + x]
+		
+		self.stride = stride
+		self.coverage = grid # (y*stride + x) -> number of claims covering tile (x,y)
+		self._summed_area = None
+	
+	def at(self, x, y):
+		return self.coverage[y*self.stride + x]
+	
+	def overlap_area(self):
+		return sum(1 for v in self.coverage if v > 1)
+	
+	def summed_area(self):
+		# summed-area table over the coverage grid, with an extra leading row and column of zeroes:
+		# entry (y*stride + x) holds the total coverage of all tiles left of x and above y
+		if self._summed_area is None:
+			stride, coverage = self.stride, self.coverage
+			table = array("l", [0]) * (stride * (self.height + 1))
+			for y in range(0, self.height):
+				row_total = 0
+				for x in range(0, self.width):
+					row_total += coverage[y*stride + x]
+					table[(y+1)*stride + x+1] = table[y*stride + x+1] + row_total
+			self._summed_area = table
+		return self._summed_area
+	
+	def claim_coverage(self, left, top, width, height):
+		# total coverage over the tiles of the given rectangle
+		table, stride = self.summed_area(), self.stride
+		top, bottom, right = top*stride, (top + height)*stride, left + width
+		return table[bottom + right] - table[top + right] - table[bottom + left] + table[top + left]
+	
+	def is_intact(self, left, top, width, height):
+		# every tile of a claim is covered at least once (by the claim itself), so it overlaps
+		# nothing exactly when its total coverage equals its area
+		return self.claim_coverage(left, top, width, height) == width * height
+	
+	def intact_ids(self):
+		# sorted IDs of the claims that overlap no other claim
+		ids, lefts, tops, widths, heights = self.columns
+		return sorted(id for id, l, t, w, h in zip(ids, lefts, tops, widths, heights) if self.is_intact(l, t, w, h))
+
+def load_claim_columns(input_file):
+	# parses all claims in the given file with a single regex pass over the whole buffer, and returns
+	# the (ids, lefts, tops, widths, heights) columns as packed integer arrays
+	with open(input_file, "rb") as f:
+		data = f.read()
+	rex = re.compile(br"^[ \t]*#(\d+) @ (\d+),(\d+): (\d+)x(\d+)[ \t\r]*$", re.MULTILINE)
+	rows = rex.findall(data)
+	if len(rows) != sum(1 for line in data.splitlines() if line.strip()):
+		raise ValueError("line")
+	if not rows:
+		return tuple(array("l") for i in range(0, 5))
+	return tuple(array("l", map(int, column)) for column in zip(*rows))
+
 class Day3(object):
 	def __init__(self, input_file):
-		self.claims = {} # id -> Claim
-		
-		with open(input_file, "r") as f:
-			lines = map(lambda line: line.strip(), f.readlines())
-		rex = re.compile(r"^#(\d+) @ (\d+),(\d+): (\d+)x(\d+)$")
-		for line in lines:
-			match = rex.match(line)
-			if not match: raise ValueError("line")
-			id = int(match.group(1))
-			left, top, width, height = map(lambda s: int(s), iter((match.group(2), match.group(3), match.group(4), match.group(5))))
-			
-			self.claims[id] = Claim(id, left, top, width, height)
+		self.columns = load_claim_columns(input_file) # (ids, lefts, tops, widths, heights)
+		self._claims = None
+	
+	@property
+	def claims(self):
+		# id -> Claim; only built when first asked for
+		if self._claims is None:
+			self._claims = dict((c[0], Claim(*c)) for c in zip(*self.columns))
+		return self._claims
 
+	def fabric(self):
+		return Fabric(self.columns)
+	
+	def mutable_fabric(self):
+		return MutableFabric(self.claims.values())
+	
 	def part1(self):
-		tiles = defaultdict(int) # tile (x,y) -> count
-		
-		for c in self.claims.values():
-			for x in range(c.left, c.left+c.width):
-				for y in range(c.top, c.top+c.height):
-					tiles[(x,y)] += 1
-
-		return len([v for v in tiles.values() if v > 1])
+		return self.fabric().overlap_area()
 
 	def part2(self):
-		claims_by_tile = defaultdict(set) # tile (x,y) -> set of claim IDs that occupy it
-		tiles_by_claim = defaultdict(set) # claim ID -> tiles that it occupies
-		
-		for c in self.claims.values():
-			for x in range(c.left, c.left+c.width):
-				for y in range(c.top, c.top+c.height):
-					claims_by_tile[(x,y)].add(c.id)
-					tiles_by_claim[c.id].add((x,y))
+		intact = self.fabric().intact_ids()
+		if intact:
+			return intact[0]
+
+class MutableFabric(object):
+	# fabric that supports adding and removing claims one at a time, keeping the overlapping area and the
+	# set of intact claims up to date. each update only visits the tiles of the claim being changed.
+	def __init__(self, claims=()):
+		self.claims = {} # id -> Claim
+		self.claims_by_tile = {} # tile (x,y) -> set of claim IDs that occupy it
+		self.conflicts = {} # claim ID -> number of other claims it overlaps with
+		self.overlap_area = 0 # number of tiles claimed more than once
+		self.intact_ids = set()
+		for c in claims:
+			self.add_claim(c)
+	
+	@staticmethod
+	def _tiles(c):
+		for x in range(c.left, c.left+c.width):
+			for y in range(c.top, c.top+c.height):
+				yield (x,y)
+	
+	def add_claim(self, c):
+		if c.id in self.claims: raise ValueError("duplicate claim ID: %d" % c.id)
+		others = set()
+		for tile in self._tiles(c):
+			ids = self.claims_by_tile.get(tile)
+			if ids is None:
+				self.claims_by_tile[tile] = set([c.id])
+				continue
+			if len(ids) == 1:
+				self.overlap_area += 1
+			others.update(ids)
+			ids.add(c.id)
 		
-		candidate_ids = [list(ids)[0] for tile,ids in claims_by_tile.items() if len(ids) == 1]
-		for id in candidate_ids:
-			if all(len(claims_by_tile[tile]) == 1 for tile in tiles_by_claim[id]):
-				return id
+		for other in others:
+			self.conflicts[other] += 1
+			self.intact_ids.discard(other)
+		self.claims[c.id] = c
+		self.conflicts[c.id] = len(others)
+		if not others:
+			self.intact_ids.add(c.id)
+	
+	def remove_claim(self, id):
+		c = self.claims.pop(id)
+		others = set()
+		for tile in self._tiles(c):
+			ids = self.claims_by_tile[tile]
+			ids.remove(id)
+			if not ids:
+				del self.claims_by_tile[tile]
+				continue
+			if len(ids) == 1:
+				self.overlap_area -= 1
+			others.update(ids)
 		
+		for other in others:
+			self.conflicts[other] -= 1
+			if self.conflicts[other] == 0:
+				self.intact_ids.add(other)
+		del self.conflicts[id]
+		self.intact_ids.discard(id)
+		return c
+
+class CoverageTree(object):
+	# segment tree over the elementary intervals between sorted y coordinates, supporting +1/-1 on a
+	# range of them and reporting the total length covered at least twice (as in the classic
+	# rectangle-union sweep, but one level deeper).
+	def __init__(self, ys):
+		self.ys = ys
+		size = 4 * max(len(ys), 1)
+		self.count = [0]*size # number of ranges fully covering this node (and not pushed down)
+		self.once  = [0]*size # length covered at least once within this node
+		self.twice = [0]*size # length covered at least twice within this node
+	
+	def add(self, lo, hi, delta, node=1, node_lo=0, node_hi=None):
+		# adds delta over the elementary intervals [lo, hi)
+		if node_hi is None: node_hi = len(self.ys) - 1
+		if hi <= node_lo or node_hi <= lo:
+			return
+		if lo <= node_lo and node_hi <= hi:
+			self.count[node] += delta
+		else:
+			mid = (node_lo + node_hi) // 2
+			self.add(lo, hi, delta, 2*node, node_lo, mid)
+			self.add(lo, hi, delta, 2*node+1, mid, node_hi)
+		self._update(node, node_lo, node_hi)
+	
+	def _update(self, node, node_lo, node_hi):
+		full = self.ys[node_hi] - self.ys[node_lo]
+		leaf = (node_hi - node_lo == 1)
+		children_once  = 0 if leaf else self.once[2*node]  + self.once[2*node+1]
+		children_twice = 0 if leaf else self.twice[2*node] + self.twice[2*node+1]
+		if self.count[node] >= 2:
+			self.once[node], self.twice[node] = full, full
+		elif self.count[node] == 1:
+			self.once[node], self.twice[node] = full, children_once
+		else:
+			self.once[node], self.twice[node] = children_once, children_twice
+	
+	def covered_twice(self):
+		return self.twice[1]
+
+class Fenwick(object):
+	def __init__(self, size):
+		self.tree = [0]*(size+1)
+	def add(self, i, delta):
+		i += 1
+		while i < len(self.tree):
+			self.tree[i] += delta
+			i += i & -i
+	def prefix_sum(self, i):
+		# sum of entries [0, i]
+		result = 0
+		i += 1
+		while i > 0:
+			result += self.tree[i]
+			i -= i & -i
+		return result
+
+def sweep_overlaps(columns):
+	# computes (total overlapping area, sorted IDs of claims that overlap no other claim) from the claim
+	# columns (as returned by load_claim_columns) with a sweep over the claims' x edges, in O(n log n) of the number of claims and without ever materializing tiles.
+	#
+	# the overlapping area is tracked with a CoverageTree over the compressed y coordinates.
+	#
+	# for intact claims, let F(X,Y) be the sum over all claims D of the area of D within [0,X)x[0,Y).
+	# the total coverage within a claim C is then found from F at its four corners, and C is intact exactly
+	# when that equals its own area. the x-overlap of D with [0,X) is X-left for claims D the sweep is
+	# currently inside of, and D.width for claims it has passed, so F(X,Y) = X*A(Y) + B(Y) where A and B are
+	# sums of the y-overlaps of D with [0,Y), weighted by 1 resp. -left (active) or width (passed).
+	# each y-overlap is itself piecewise linear in Y: Y*([Y>=top] - [Y>=bottom]) - top*[Y>=top] + bottom*[Y>=bottom],
+	# so A and B can each be kept as a pair of Fenwick trees (coefficient of Y, and constant term) over y.
+	ids, lefts, tops, widths, heights = columns
+	if not ids:
+		return 0, []
+	rights  = [l + w for l, w in zip(lefts, widths)]
+	bottoms = [t + h for t, h in zip(tops, heights)]
+	ys = sorted(set(tops) | set(bottoms))
+	y_index = dict((y, i) for i, y in enumerate(ys))
+	
+	A = (Fenwick(len(ys)), Fenwick(len(ys))) # (coefficient of Y, constant)
+	B = (Fenwick(len(ys)), Fenwick(len(ys)))
+	def add_y_overlap(trees, k, weight):
+		lin, const = trees
+		lin.add(y_index[tops[k]], weight);       const.add(y_index[tops[k]], -weight*tops[k])
+		lin.add(y_index[bottoms[k]], -weight);   const.add(y_index[bottoms[k]], weight*bottoms[k])
+	def evaluate(trees, Y):
+		lin, const = trees
+		i = y_index[Y]
+		return Y*lin.prefix_sum(i) + const.prefix_sum(i)
+	
+	ENTER, LEAVE, QUERY = 0, 1, 2
+	events = [] # (x, kind, claim index)
+	for k in range(0, len(ids)):
+		events.append((lefts[k], ENTER, k))
+		events.append((rights[k], LEAVE, k))
+		events.append((lefts[k], QUERY, k))
+		events.append((rights[k], QUERY, k))
+	# F is continuous in X, so the relative order of updates and queries at the same x does not matter
+	events.sort()
+	
+	tree = CoverageTree(ys)
+	overlap_area = 0
+	coverage = [0]*len(ids) # claim index -> total coverage within the claim
+	last_x = events[0][0]
+	for x, kind, k in events:
+		overlap_area += tree.covered_twice() * (x - last_x)
+		last_x = x
+		if kind == ENTER:
+			tree.add(y_index[tops[k]], y_index[bottoms[k]], 1)
+			add_y_overlap(A, k, 1)
+			add_y_overlap(B, k, -lefts[k])
+		elif kind == LEAVE:
+			tree.add(y_index[tops[k]], y_index[bottoms[k]], -1)
+			add_y_overlap(A, k, -1)
+			add_y_overlap(B, k, lefts[k])
+			add_y_overlap(B, k, widths[k])
+		else:
+			sign = 1 if x == rights[k] else -1
+			for Y, ysign in ((bottoms[k], 1), (tops[k], -1)):
+				F = x*evaluate(A, Y) + evaluate(B, Y)
+				coverage[k] += sign * ysign * F
+	
+	intact = sorted(ids[k] for k in range(0, len(ids)) if coverage[k] == widths[k] * heights[k])
+	return overlap_area, intact
+
 if __name__ == "__main__":
 	day = Day3("day3.txt")
 	print(day.part1())
-	print(day.part2())
\ No newline at end of file
+	print(day.part2())
+	print(sweep_overlaps(day.columns))
\ No newline at end of file
@@ -1,7 +1,7 @@
 from __future__ import print_function,absolute_import
 import sys, os, re
-import arrow
 from pprint import pprint
+import heapq
 
 class Event(object):
 	rex = re.compile(r"^\[([^\]]+)\] (.*)$")
@@ -10,24 +10,47 @@ class Event(object):
 	WAKES_UP = 2
 	
 	def __init__(self, timestamp, event_type, guard_id=None):
-		self.timestamp = timestamp
+		self.timestamp = timestamp # packed as the integer YYYYMMDDHHMM, so that it sorts chronologically
 		self.event_type = event_type
 		self.guard_id = guard_id
 	
+	year   = property(lambda self: self.timestamp // 100000000)
+	month  = property(lambda self: self.timestamp // 1000000 % 100)
+	day    = property(lambda self: self.timestamp // 10000 % 100)
+	hour   = property(lambda self: self.timestamp // 100 % 100)
+	minute = property(lambda self: self.timestamp % 100)
+	
+	def datetime(self):
+		# timezone-aware (UTC) arrow object for this event's timestamp; arrow is only imported when this is used
+		import arrow
+		return arrow.get("%04d-%02d-%02d %02d:%02d" % (self.year, self.month, self.day, self.hour, self.minute), "YYYY-MM-DD HH:mm")
+	
 	def __str__(self):
 		typestr = ("STARTS_SHIFT" if self.event_type == self.STARTS_SHIFT else \
 		          ("FALLS_ASLEEP" if self.event_type == self.FALLS_ASLEEP else \
 		          ("WAKES_UP"     if self.event_type == self.WAKES_UP     else "<INVALID>")))
-		return "[%s] %s (guard=%s)" % (self.timestamp.format("YYYY-MM-DD HH:mm:ss ZZ"), typestr, self.guard_id)
+		timestamp_str = "%04d-%02d-%02d %02d:%02d:00 +00:00" % (self.year, self.month, self.day, self.hour, self.minute)
+		return "[%s] %s (guard=%s)" % (timestamp_str, typestr, self.guard_id)
+	
+	@classmethod
+	def parse_timestamp(cls, timestamp_str):
+		# reads a fixed-width "YYYY-MM-DD HH:MM" string straight into its packed integer form
+		if len(timestamp_str) != 16 or timestamp_str[4] != "-" or timestamp_str[7] != "-" or timestamp_str[10] != " " or timestamp_str[13] != ":":
+			raise ValueError("bad timestamp: " + timestamp_str)
+		return int(timestamp_str[0:4] + timestamp_str[5:7] + timestamp_str[8:10] + timestamp_str[11:13] + timestamp_str[14:16])
 	
 	@classmethod
 	def parse(cls, line):
-		match = cls.rex.match(line)
-		if not match: raise ValueError("bad input line: " + line)
-		timestamp_str = match.group(1).strip()
-		event_str = match.group(2).strip()
+		if line[:1] == "[" and line[17:19] == "] ":
+			# fast path for the usual fixed-width "[YYYY-MM-DD HH:MM] " prefix
+			ts = cls.parse_timestamp(line[1:17])
+			event_str = line[19:].strip()
+		else:
+			match = cls.rex.match(line)
+			if not match: raise ValueError("bad input line: " + line)
+			ts = cls.parse_timestamp(match.group(1).strip())
+			event_str = match.group(2).strip()
 		
-		ts = arrow.get(timestamp_str, "YYYY-MM-DD HH:mm")
 		if event_str == "wakes up":
 			return Event(ts, cls.WAKES_UP) # we don't know which guard yet, need to sort by timestamp first
 		elif event_str == "falls asleep":
@@ -43,41 +66,80 @@ class Event(object):
 class Guard(object):
 	def __init__(self, id):
 		self.id = id
-		self.timelines = {} # date -> array of 60 ints, one for each minute (1 = awake, 0 = asleep)
+		self.shift_date = None # YYYYMMDD of the shift currently being recorded
+		self.timeline = None # array of 60 ints for that shift, one for each minute (1 = awake, 0 = asleep)
+		self.histogram = [0]*60 # minute -> number of days asleep at that minute, kept up to date by record_event
+		self.total_asleep = 0 # sum of the histogram
 	def record_event(self, event):
+		# events must be recorded in chronological order; only the current shift's timeline is kept,
+		# everything else is folded into the histogram as it is recorded
 		assert event.event_type in [Event.FALLS_ASLEEP, Event.WAKES_UP]
-		date_key = event.timestamp.format("MM-DD")
-		minutes = int(event.timestamp.format("m"))
+		date_key = event.timestamp // 10000
+		minutes = event.minute
 		
-		timeline = self.timelines.get(date_key, [1]*60)
-		if event.event_type == Event.FALLS_ASLEEP:
-			timeline[minutes:] = [0]*(60-minutes)
-		elif event.event_type == Event.WAKES_UP:
-			timeline[minutes:] = [1]*(60-minutes)
-		self.timelines[date_key] = timeline
+		if date_key != self.shift_date:
+			self.shift_date = date_key
+			self.timeline = [1]*60
+		timeline = self.timeline
+		new_value = 0 if event.event_type == Event.FALLS_ASLEEP else 1
+		for m in range(minutes, 60):
+			delta = timeline[m] - new_value # +1 if falling asleep at m, -1 if waking up, 0 if unchanged
+			self.histogram[m] += delta
+			self.total_asleep += delta
+			timeline[m] = new_value
 	
 	def __str__(self):
-		result = "Guard #%d:\n" % (self.id,)
-		for date_key, timeline in sorted(self.timelines.items(), key=lambda kv: kv[0]):
-			result += "%s: %s\n" % (date_key, "".join(map(lambda b: ("." if b else "#"), timeline)))
+		result = "Guard #%d: %d minutes asleep\n" % (self.id, self.total_asleep)
+		result += "days asleep per minute: %s\n" % (" ".join(str(n) for n in self.histogram),)
+		if self.timeline is not None:
+			date_str = "%04d-%02d-%02d" % (self.shift_date // 10000, self.shift_date // 100 % 100, self.shift_date % 100)
+			result += "%s: %s\n" % (date_str, "".join(map(lambda b: ("." if b else "#"), self.timeline)))
 		return result
 	
 	def __repr__(self):
 		return str(self)
 	
 	def minutes_asleep(self):
-		result = 0
-		for timeline in self.timelines.values():
-			result += sum([1-b for b in timeline])
-		return result
+		return self.total_asleep
 	
 	def sleepiest_minute(self):
-		max = (None, 0)
-		for m in range(0,60):
-			days_asleep = len([TL for TL in self.timelines.values() if TL[m] == 0])
-			if days_asleep > max[1]: max = (m, days_asleep)
-		return max
+		# (minute, days asleep) for the earliest minute with the most days asleep, or (None, 0) if never asleep
+		m = max(range(0,60), key=self.histogram.__getitem__)
+		if self.histogram[m] == 0: return (None, 0)
+		return (m, self.histogram[m])
 		
+def read_events(input_file):
+	with open(input_file, "r") as f:
+		for line in f:
+			line = line.strip()
+			if line:
+				yield Event.parse(line)
+
+def reorder_events(events, window):
+	# restores chronological order for a stream of events in which each event is at most 'window'
+	# positions away from where it belongs, holding no more than window+1 events at a time
+	heap = [] # (timestamp, sequence number, event)
+	last = None
+	for seq, e in enumerate(events):
+		heapq.heappush(heap, (e.timestamp, seq, e))
+		if len(heap) > window:
+			ts, _, earliest = heapq.heappop(heap)
+			if last is not None and ts < last:
+				raise ValueError("event out of order by more than %d positions: %s" % (window, earliest))
+			last = ts
+			yield earliest
+	while heap:
+		yield heapq.heappop(heap)[2]
+
+def merge_shards(input_files, window=1000):
+	# k-way merge of several partially ordered shard files into a single chronological stream of events
+	streams = []
+	for shard, input_file in enumerate(input_files):
+		stream = ((e.timestamp, shard, seq, e) for seq, e in enumerate(reorder_events(read_events(input_file), window)))
+		streams.append(stream)
+	for _, _, _, e in heapq.merge(*streams):
+		yield e
+
 class Day4(object):
 	def __init__(self, input_file):
 		events = []
@@ -86,20 +148,31 @@ class Day4(object):
 				events.append(Event.parse(line.strip()))
 		
 		events = sorted(events, key=lambda e: e.timestamp)
-		assert events[0].event_type == Event.STARTS_SHIFT
-		
-		guards = {}
+		self.guards = {}
+		self.ingest(events)
+	
+	@classmethod
+	def from_shards(cls, input_files, window=1000):
+		# builds the guard records from several shard files, each of which may be out of order by up to
+		# 'window' events; events are fed to the guards as they come out of the merge, so memory is
+		# bounded by the window size (per shard) rather than by the total log size.
+		day = cls.__new__(cls)
+		day.guards = {}
+		day.ingest(merge_shards(input_files, window))
+		return day
+	
+	def ingest(self, events):
+		# assigns a chronologically ordered stream of events to the guards on shift
 		current = None
 		for e in events:
 			if e.event_type == Event.STARTS_SHIFT:
-				current = guards.get(e.guard_id)
+				current = self.guards.get(e.guard_id)
 				if not current:
 					current = Guard(e.guard_id)
-					guards[e.guard_id] = current
+					self.guards[e.guard_id] = current
 				continue
+			assert current is not None # the first event must start a shift
 			current.record_event(e)
-		
-		self.guards = guards
 
 	def part1(self):
 		sleepiest_guard = max(self.guards.values(), key=lambda g: g.minutes_asleep())
@@ -112,6 +185,11 @@ class Day4(object):
 			sleepiest_minute, num_days = guard.sleepiest_minute()
 			if num_days > max[1]: max = (guard, num_days, sleepiest_minute)
 		return max[0].id * max[2]
+	
+	def most_asleep_at(self, minute):
+		# (guard, days asleep) for the guard that was asleep on the most days at the given minute
+		guard = max(self.guards.values(), key=lambda g: g.histogram[minute])
+		return (guard, guard.histogram[minute])
 		
 if __name__ == "__main__":
 	day = Day4("day4.txt")
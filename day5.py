@@ -1,6 +1,67 @@
 from __future__ import print_function,absolute_import
 import sys, os, re
 from pprint import pprint
+import multiprocessing
+
+def reacts(a, b):
+	# whether two units (as ASCII codes) are the same letter in opposite case, i.e. differ only in the 0x20 bit
+	return (a ^ b) == 0x20 and 97 <= (a | 0x20) <= 122
+
+def reduce_units(data):
+	# single-pass reduction: units are pushed onto a stack, and a unit that reacts with the top of the stack
+	# pops it instead
+	stack = bytearray()
+	for c in bytearray(data):
+		if stack and reacts(stack[-1], c):
+			stack.pop()
+		else:
+			stack.append(c)
+	return stack
+
+def reduce_polymer(s):
+	# returns (reduced polymer, its length)
+	stack = reduce_units(s.encode("ascii"))
+	return stack.decode("ascii"), len(stack)
+
+def merge_residues(left, right):
+	# merges two reduced segments by cancelling units across the seam; 'left' is extended in place
+	i = 0
+	while left and i < len(right) and reacts(left[-1], right[i]):
+		left.pop()
+		i += 1
+	left += right[i:]
+	return left
+
+def _reduce_chunk(args):
+	# worker entry point for reduce_file_chunked
+	input_file, offset, size = args
+	with open(input_file, "rb") as f:
+		f.seek(offset)
+		data = f.read(size)
+	return reduce_units(data.translate(None, b" \t\r\n"))
+
+def reduce_file_chunked(input_file, chunk_size=1<<24, processes=None):
+	# reduces a polymer file of any size by splitting it into chunks that are reduced in parallel workers,
+	# then folding the reduced chunks together in order, cancelling units at each seam. since a reduced chunk
+	# is never longer than the chunk itself, memory is bounded by the chunk size plus the final residue.
+	# returns (reduced polymer, its length).
+	file_size = os.path.getsize(input_file)
+	jobs = [(input_file, offset, chunk_size) for offset in range(0, file_size, chunk_size)]
+	
+	residue = bytearray()
+	pool = multiprocessing.Pool(processes)
+	try:
+		for chunk_residue in pool.imap(_reduce_chunk, jobs):
+			merge_residues(residue, chunk_residue)
+	finally:
+		pool.terminate()
+		pool.join()
+	return residue.decode("ascii"), len(residue)
+
+def _reduced_size_without(args):
+	# worker entry point for Day5.part2_parallel
+	polymer, letter = args
+	return letter, reduce_polymer(re.sub(letter, "", polymer, flags=re.IGNORECASE))[1]
 
 class Day5(object):
 	def __init__(self, input_file):
@@ -8,7 +69,11 @@ class Day5(object):
 			data = f.read().strip()
 		self.data = data
 
+	def reduce_stack(self, s):
+		return reduce_polymer(s)
+	
 	def reduce(self, s):
+		# reference implementation of reduce_stack, repeatedly applying a regex until nothing changes; quadratic
 		rex = re.compile(r"(aA|Aa|bB|Bb|cC|Cc|dD|Dd|eE|Ee|fF|Ff|gG|Gg|hH|Hh|iI|Ii|jJ|Jj|kK|Kk|lL|Ll|mM|Mm|nN|Nn|oO|Oo|pP|Pp|qQ|Qq|rR|Rr|sS|Ss|tT|Tt|uU|Uu|vV|Vv|wW|Ww|xX|Xx|yY|Yy|zZ|Zz)")
 		
 		current = s
@@ -20,8 +85,8 @@ class Day5(object):
 		return current
 
 	def part1(self):
-		reduced = self.reduce(self.data)
-		return len(reduced)
+		reduced, length = self.reduce_stack(self.data)
+		return length
 
 	def part2(self):
 		min = None
@@ -29,7 +94,7 @@ class Day5(object):
 			sys.stdout.write("testing letter %s ... " % chr(ord('a')+i))
 			sys.stdout.flush()
 			customized_data = re.sub(chr(ord('a')+i), "", self.data, flags=re.IGNORECASE)
-			reduced_size = len(self.reduce(customized_data))
+			reduced_size = self.reduce_stack(customized_data)[1]
 			sys.stdout.write("%5d units" % (reduced_size,))
 			if (min is None) or reduced_size < min:
 				min = reduced_size
@@ -38,8 +103,31 @@ class Day5(object):
 			sys.stdout.flush()
 
 		return min
+	
+	def part2_parallel(self, processes=None, progress=False):
+		# removing a unit type commutes with reduction (every reaction in the full polymer is still possible
+		# once a letter is removed), so the polymer is reduced once up front and all 26 variants are derived
+		# from the much shorter reduced form. the variants are reduced concurrently in a process pool.
+		reduced = reduce_polymer(self.data)[0]
+		jobs = [(reduced, chr(ord('a')+i)) for i in range(0, 26)]
+		
+		min = None
+		pool = multiprocessing.Pool(processes)
+		try:
+			for letter, reduced_size in pool.imap_unordered(_reduced_size_without, jobs):
+				if progress:
+					sys.stdout.write("letter %s: %5d units\n" % (letter, reduced_size))
+					sys.stdout.flush()
+				if (min is None) or reduced_size < min:
+					min = reduced_size
+		finally:
+			pool.terminate()
+			pool.join()
+		return min
 
 if __name__ == "__main__":
 	day = Day5("day5.txt")
 	print(day.part1())
-	print(day.part2())
\ No newline at end of file
+	print(day.part2())
+	print(day.part2_parallel())
+	print(reduce_file_chunked("day5.txt", chunk_size=4096)[1])
\ No newline at end of file
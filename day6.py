@@ -4,6 +4,7 @@ from collections import namedtuple, defaultdict
 from pprint import pprint
 from math import sqrt, atan2, degrees, pi
 from random import shuffle
+from array import array
 
 def manhattan(p1, p2):
 	return abs(p2.x-p1.x) + abs(p2.y-p1.y)
@@ -99,6 +100,167 @@ class Grid(object):
 	BL = property(lambda self: Point(self.min_x, self.min_y))
 	BR = property(lambda self: Point(self.max_x, self.min_y))
 	
+TIED = -1
+UNCLAIMED = -2
+
+def ownership_grid(coords, min_x, max_x, min_y, max_y):
+	# computes, for every cell of the given bounding area, the index of the coordinate closest to it
+	# (or TIED if two or more are equally close), using a multi-source BFS wavefront over a flat grid.
+	# on an obstacle-free grid, the BFS distance is the manhattan distance, and a cell's set of closest
+	# coordinates is the union of those of its neighbours one step closer, so ties simply propagate.
+	# returns the grid as a flat array indexed by (y-min_y)*width + (x-min_x).
+	width = max_x - min_x + 1
+	height = max_y - min_y + 1
+	owner = array("l", [UNCLAIMED]) * (width * height)
+	
+	frontier = []
+	for i, c in enumerate(coords):
+		cell = (c.y - min_y)*width + (c.x - min_x)
+		if owner[cell] == UNCLAIMED:
+			owner[cell] = i
+			frontier.append(cell)
+		else:
+			owner[cell] = TIED # several coordinates at the same position
+	
+	while frontier:
+		reached = {} # cell -> owner, for cells first reached in this step
+		for cell in frontier:
+			o = owner[cell]
+			y, x = divmod(cell, width)
+			neighbours = []
+			if x > 0:        neighbours.append(cell - 1)
+			if x < width-1:  neighbours.append(cell + 1)
+			if y > 0:        neighbours.append(cell - width)
+			if y < height-1: neighbours.append(cell + width)
+			for n in neighbours:
+				if owner[n] != UNCLAIMED: continue
+				if n not in reached:
+					reached[n] = o
+				elif reached[n] != o:
+					reached[n] = TIED
+		for n, o in reached.items():
+			owner[n] = o
+		frontier = list(reached.keys())
+	
+	return owner
+
+def area_counts(owner, num_coords):
+	# number of cells owned by each coordinate index (a bincount over the ownership grid, ignoring ties)
+	counts = [0]*num_coords
+	for o in owner:
+		if o >= 0: counts[o] += 1
+	return counts
+
+def _strictly_maximal(points):
+	# indices of the (u,v) points for which no other point has both u' >= u and v' >= v
+	result = set()
+	best_v = None # largest v seen among points with a strictly larger u
+	order = sorted(range(0, len(points)), key=lambda i: points[i][0], reverse=True)
+	start = 0
+	while start < len(order):
+		end = start
+		while end < len(order) and points[order[end]][0] == points[order[start]][0]:
+			end += 1
+		group = sorted((points[i][1], i) for i in order[start:end])
+		top_v, top_i = group[-1]
+		unique_top = (len(group) == 1 or group[-2][0] < top_v)
+		if unique_top and (best_v is None or top_v > best_v):
+			result.add(top_i)
+		if best_v is None or top_v > best_v:
+			best_v = top_v
+		start = end
+	return result
+
+def infinite_coords(coords):
+	# indices of the coordinates whose area extends infinitely, using exact integer geometry only.
+	#
+	# beyond the bounding box, the owner of a cell in a given column (say, east of all coords) no longer depends
+	# on how far east it is, since every distance grows by the same amount. in that column, a coordinate P wins
+	# at some row exactly when it wins at its own row py, i.e. when no other coordinate Q satisfies
+	# qx - px >= |qy - py| -- Q would lie in the closed 90 degree cone east of P. rotating to u = x+y, v = x-y,
+	# that cone is simply {u >= pu, v >= pv}, so the coordinates with an infinite area in that direction are the
+	# strictly maximal points of (u, v). the other three directions are the same with u and/or v negated.
+	infinite = set()
+	for su, sv in ((1,1), (-1,-1), (1,-1), (-1,1)):
+		points = [(su*(c.x + c.y), sv*(c.x - c.y)) for c in coords]
+		infinite |= _strictly_maximal(points)
+	return infinite
+
+def axis_totals(values, lo, hi):
+	# sum of |v - values[i]| over all i, for every v in [lo, hi]; O(N log N + (hi-lo)).
+	# stepping from v to v+1 moves away from every value <= v and towards every value > v.
+	values = sorted(values)
+	total = sum(abs(lo - v) for v in values)
+	below = sum(1 for v in values if v <= lo) # number of values <= current position
+	result = []
+	for pos in range(lo, hi+1):
+		result.append(total)
+		total += below - (len(values) - below)
+		while below < len(values) and values[below] <= pos+1:
+			below += 1
+	return result
+
+def count_pairs_below(xs, ys, threshold):
+	# number of (a, b) pairs from xs and ys with a + b < threshold, with a two-pointer sweep over both sorted
+	xs = sorted(xs)
+	ys = sorted(ys)
+	count = 0
+	j = len(ys)
+	for a in xs:
+		while j > 0 and a + ys[j-1] >= threshold:
+			j -= 1
+		if j == 0: break
+		count += j
+	return count
+
+def _axis_totals_with_margin(coords, threshold):
+	# per-column and per-row distance totals, over a range wide enough to contain every point whose total
+	# distance is below the threshold: outside the bounding box each term grows by len(coords) per step,
+	# so such points lie at most threshold // len(coords) beyond it in any direction.
+	margin = threshold // len(coords) + 1
+	x_totals = axis_totals([c.x for c in coords], min(c.x for c in coords) - margin, max(c.x for c in coords) + margin)
+	y_totals = axis_totals([c.y for c in coords], min(c.y for c in coords) - margin, max(c.y for c in coords) + margin)
+	return x_totals, y_totals
+
+def safe_region_size(coords, threshold):
+	# number of points whose total manhattan distance to all coords is below the threshold.
+	# the total distance is the sum of an x term and a y term, each of which only depends on one axis,
+	# so the per-column and per-row totals are computed separately and then paired up.
+	x_totals, y_totals = _axis_totals_with_margin(coords, threshold)
+	return count_pairs_below(x_totals, y_totals, threshold)
+
+class SafeRegionHistogram(object):
+	# answers "how many points have a total distance below T" for any T up to a maximum threshold in O(1),
+	# after building a cumulative histogram of total distances once. the histogram of x+y totals is the
+	# convolution of the per-axis histograms, which only needs to be taken over their non-zero entries.
+	def __init__(self, coords, max_threshold):
+		self.max_threshold = max_threshold
+		x_totals, y_totals = _axis_totals_with_margin(coords, max_threshold)
+		
+		x_histogram = defaultdict(int) # total x distance -> number of columns
+		for total in x_totals:
+			if total < max_threshold: x_histogram[total] += 1
+		y_histogram = defaultdict(int) # total y distance -> number of rows
+		for total in y_totals:
+			if total < max_threshold: y_histogram[total] += 1
+		
+		histogram = [0]*max_threshold # total distance -> number of points
+		y_entries = sorted(y_histogram.items())
+		for x_total, x_count in x_histogram.items():
+			for y_total, y_count in y_entries:
+				if x_total + y_total >= max_threshold: break
+				histogram[x_total + y_total] += x_count * y_count
+		
+		cumulative = [0]*(max_threshold+1) # T -> number of points with total distance < T
+		for T in range(0, max_threshold):
+			cumulative[T+1] = cumulative[T] + histogram[T]
+		self.cumulative = cumulative
+	
+	def size(self, threshold):
+		if not (0 <= threshold <= self.max_threshold):
+			raise ValueError("threshold must be between 0 and %d" % self.max_threshold)
+		return self.cumulative[threshold]
+
 class Day6(object):
 	def __init__(self, input_file):
 		with open(input_file, "r") as f:
@@ -113,35 +275,25 @@ class Day6(object):
 		
 		self.coords = coords
 
+	def finite_coords(self):
+		infinite = infinite_coords(self.coords)
+		return [c for i, c in enumerate(self.coords) if i not in infinite]
+	
 	def part1(self):
-		# for each coordinate X on the plane, see if we can identify a line in the plane so that all other coordinates
-		# lie on the same side of the line. if so, then the area of this coordinate will extend infinitely, because
-		# infinitely many points from X outwards perpendicular to this line will have X as its closest coordinate.
-		
-		finite_coords = []
-		for X in self.coords:
-			# pick any initial other coordinate A, and construct the vector XA.
-			# then iterate over all remaining coordinates C, taking the signed angle between XA and XC,
-			# and keeping track of the highest and lowest values seen (i.e. the biggest angles anti-clockwise resp. clockwise relative to XA).
-			#
-			# the angular span in X that contains all other points is then found as the sum of the largest anti-clockwise rotation
-			# and the largest clockwise rotation. if this span exceeds 180 degrees, then some points lie "behind" X, and it cannot extend infinitely
-			
-			others = [p for p in self.coords if p != X]
-			
-			v = Vector.between_points(X, others[0])
-			max_angle_seen = 0
-			min_angle_seen = 0
-			
-			has_infinite_area = True
-			for C in others[1:]:
-				v2 = Vector.between_points(X, C)
-				angle = v.signed_angle_to(v2)
-				max_angle_seen = max(max_angle_seen, angle)
-				min_angle_seen = min(min_angle_seen, angle)
-			
-			if max_angle_seen - min_angle_seen > pi:
-				finite_coords.append(X)
+		finite_coords = set(self.finite_coords())
+		
+		# find the bounding area of the place containing all coords
+		min_x = min(p.x for p in self.coords)
+		max_x = max(p.x for p in self.coords)
+		min_y = min(p.y for p in self.coords)
+		max_y = max(p.y for p in self.coords)
+		
+		owner = ownership_grid(self.coords, min_x, max_x, min_y, max_y)
+		areas = area_counts(owner, len(self.coords))
+		return max(area for i, area in enumerate(areas) if self.coords[i] in finite_coords)
+	
+	def part1_bruteforce(self):
+		finite_coords = self.finite_coords()
 		
 		# find the bounding area of the place containing all coords
 		min_x = min(p.x for p in self.coords)
@@ -156,7 +308,7 @@ class Day6(object):
 		# are the same. keep track of the coordinate with the largest area along the way.
 		coord_areas = defaultdict(int) # coord -> area size
 		for p in grid:
-			distances = sorted((manhattan(p,c), c) for c in self.coords) # (distance, coord) pairs
+			distances = sorted(((manhattan(p,c), c) for c in self.coords), key=lambda pair: pair[0]) # (distance, coord) pairs
 			if distances[0][0] == distances[1][0]:
 				# disregard, has no shortest distance to any singular coordinate
 				continue
@@ -168,7 +320,15 @@ class Day6(object):
 		
 		return max(coord_areas.values())
 	
-	def part2(self):
+	def part2(self, threshold=10000):
+		return safe_region_size(self.coords, threshold)
+	
+	def safe_region_histogram(self, max_threshold=10000):
+		return SafeRegionHistogram(self.coords, max_threshold)
+	
+	def part2_bruteforce(self):
+		# note: only considers points within the bounding area of the coords
+		
 		# find the bounding area of the place containing all coords
 		min_x = min(p.x for p in self.coords)
 		max_x = max(p.x for p in self.coords)
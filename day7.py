@@ -2,6 +2,12 @@ from __future__ import print_function,absolute_import
 import sys, os, re
 from collections import namedtuple, defaultdict
 from pprint import pprint
+import heapq, time
+import multiprocessing, multiprocessing.pool
+try:
+	from queue import Queue, Empty
+except ImportError:
+	from Queue import Queue, Empty
 
 class Node(object):
 	def __init__(self, name, work=1):
@@ -74,12 +80,263 @@ class WorkerPool(object):
 		assert (i is not None)
 		self.slots[i] = node
 		
+def simulate_events(nodes, num_workers):
+	# event-driven equivalent of running the nodes through a WorkerPool; see StepGraph.schedule.
+	# the nodes themselves are left untouched.
+	# returns (order in which the nodes completed, total time taken).
+	edges = [(n.name, succ.name) for n in nodes.values() for succ in n.followed_by]
+	graph = StepGraph(edges, steps=nodes.keys(), work=lambda name: nodes[name].work_remaining)
+	order, time_taken = graph.schedule(num_workers)
+	return "".join(order), time_taken
+
+def step_number(name):
+	# 1-based number of a step name in spreadsheet-column order: A=1 .. Z=26, AA=27, AB=28, ...
+	# other names have no natural cost; graphs using them must pass their own work function to StepGraph
+	if not re.match(r"^[A-Z]+$", name):
+		raise ValueError("step name must consist of uppercase letters A-Z only: %r" % (name,))
+	result = 0
+	for char in name:
+		result = result*26 + (ord(char) - ord("A") + 1)
+	return result
+
+class StepGraph(object):
+	# integer-indexed dependency graph. steps are numbered in alphabetical order of their names, so that
+	# a heap of step indices pops steps alphabetically; prerequisites are tracked as indegree counters
+	# rather than lists, so completing a step costs O(successors) instead of a list scan.
+	def __init__(self, edges, work_offset=0, work=step_number, steps=()):
+		# edges: iterable of (predecessor name, successor name) pairs
+		# steps: names of any additional steps that have no dependencies at all
+		edges = list(edges)
+		self.names = sorted(set(name for edge in edges for name in edge) | set(steps))
+		self.index = index = dict((name, i) for i, name in enumerate(self.names)) # name -> step
+		self.successors = [[] for name in self.names]
+		self.indegree = [0]*len(self.names)
+		for pred, succ in edges:
+			self.successors[index[pred]].append(index[succ])
+			self.indegree[index[succ]] += 1
+		self.work = [work_offset + work(name) for name in self.names]
+		for name, amount in zip(self.names, self.work):
+			if amount <= 0: raise ValueError("step %s must take a positive amount of work, got %r" % (name, amount))
+	
+	def __len__(self):
+		return len(self.names)
+	
+	def roots(self):
+		return [self.names[i] for i in range(0, len(self)) if self.indegree[i] == 0]
+	
+	def topological_order(self):
+		# alphabetically smallest topological order, as a list of step names
+		ready = ReadySteps(self)
+		result = []
+		while ready:
+			i = ready.pop()
+			result.append(self.names[i])
+			ready.complete(i)
+		ready.check_all_completed()
+		return result
+	
+	def schedule(self, num_workers):
+		# event-driven simulation of the steps on a pool of workers, in O(E + V log V): rather than ticking one
+		# second at a time, the clock jumps straight to the next completion. ready steps are started in
+		# alphabetical order, running steps wait in a heap ordered by (finish time, slot), and free slots in a
+		# heap so that steps are assigned to the lowest free slot as WorkerPool does; simultaneous completions
+		# are therefore reported in the same (slot) order.
+		# returns (list of step names in completion order, total time taken)
+		ready = ReadySteps(self)
+		free_slots = list(range(0, num_workers))
+		running = [] # (finish time, slot, step)
+		
+		clock = 0
+		result = []
+		while ready or running:
+			while ready and free_slots:
+				i = ready.pop()
+				heapq.heappush(running, (clock + self.work[i], heapq.heappop(free_slots), i))
+			
+			clock = running[0][0]
+			while running and running[0][0] == clock:
+				_, slot, i = heapq.heappop(running)
+				heapq.heappush(free_slots, slot)
+				result.append(self.names[i])
+				ready.complete(i)
+		ready.check_all_completed()
+		return result, clock
+	
+	def critical_path(self):
+		# total work along the heaviest dependency chain; no number of workers can finish faster than this
+		finish = self.work[:] # step -> earliest possible finish time with unlimited workers
+		for name in self.topological_order():
+			i = self.index[name]
+			for succ in self.successors[i]:
+				finish[succ] = max(finish[succ], finish[i] + self.work[succ])
+		return max(finish) if finish else 0
+
+class ReadySteps(object):
+	# the steps of a StepGraph whose prerequisites have all completed, popped in alphabetical order;
+	# completing a step releases the successors that were only waiting on it
+	def __init__(self, graph):
+		self.graph = graph
+		self.indegree = graph.indegree[:]
+		self.heap = [i for i in range(0, len(graph)) if self.indegree[i] == 0]
+		heapq.heapify(self.heap)
+		self.completed = 0
+	
+	def __len__(self):
+		return len(self.heap)
+	
+	def pop(self):
+		return heapq.heappop(self.heap)
+	
+	def complete(self, i):
+		self.completed += 1
+		for succ in self.graph.successors[i]:
+			self.indegree[succ] -= 1
+			if self.indegree[succ] == 0:
+				heapq.heappush(self.heap, succ)
+	
+	def check_all_completed(self):
+		if self.completed != len(self.graph):
+			raise ValueError("dependency graph contains a cycle")
+
+_sweep_graph = None # StepGraph shared with sweep_workers' pool processes
+
+def _init_sweep(graph):
+	global _sweep_graph
+	_sweep_graph = graph
+
+def _sweep_time(num_workers):
+	return num_workers, _sweep_graph.schedule(num_workers)[1]
+
+def sweep_workers(graph, max_workers, processes=None):
+	# completion times of the given StepGraph for 1 up to max_workers workers, evaluated in parallel batches.
+	# the sweep stops early once some worker count reaches the critical-path bound, since adding more
+	# workers cannot go below it. returns (critical path length, [(num_workers, time taken), ...]).
+	bound = graph.critical_path()
+	processes = processes or multiprocessing.cpu_count()
+	curve = []
+	pool = multiprocessing.Pool(processes, _init_sweep, (graph,))
+	try:
+		for first in range(1, max_workers+1, processes):
+			batch = range(first, min(first + processes, max_workers+1))
+			curve.extend(sorted(pool.imap_unordered(_sweep_time, batch)))
+			if any(time_taken <= bound for _, time_taken in curve):
+				break
+	finally:
+		pool.terminate()
+		pool.join()
+	
+	# trim past the first worker count that reached the bound
+	for k, (num_workers, time_taken) in enumerate(curve):
+		if time_taken <= bound:
+			curve = curve[:k+1]
+			break
+	return bound, curve
+
+def _timed_call(args):
+	# runs a task in a worker, returning (name, start, end, result, exception)
+	name, func = args
+	start = time.time()
+	try:
+		result = func()
+		return name, start, time.time(), result, None
+	except Exception as e:
+		return name, start, time.time(), None, e
+
+class ExecutionReport(object):
+	def __init__(self, num_workers, order, timings, results, wall_time):
+		self.num_workers = num_workers
+		self.order = order # step names in completion order
+		self.timings = timings # name -> (start, end), in seconds since the execution started
+		self.results = results # name -> return value of the task
+		self.wall_time = wall_time
+	
+	def busy_time(self):
+		return sum(end - start for start, end in self.timings.values())
+	
+	def parallelism(self):
+		# average number of tasks running at once
+		return self.busy_time() / self.wall_time if self.wall_time > 0 else 0.0
+	
+	def utilization(self):
+		# fraction of the available worker time that was spent running tasks
+		return self.parallelism() / self.num_workers
+	
+	def __str__(self):
+		result = "%d tasks on %d workers in %.3fs (parallelism %.2f, utilization %.1f%%)\n" % \
+			(len(self.order), self.num_workers, self.wall_time, self.parallelism(), 100*self.utilization())
+		for name in self.order:
+			start, end = self.timings[name]
+			result += "  %s: %.3fs - %.3fs (%.3fs)\n" % (name, start, end, end - start)
+		return result
+
+def execute_graph(graph, tasks, num_workers, processes=False):
+	# runs real callables in the dependency order of the given StepGraph, on a thread pool (or a process
+	# pool, in which case the tasks must be picklable) of num_workers workers. ready steps are started in
+	# alphabetical order whenever a worker is free, and completed steps release their successors.
+	# tasks: step name -> callable taking no arguments. returns an ExecutionReport.
+	missing = [name for name in graph.names if name not in tasks]
+	if missing: raise ValueError("no task given for step(s): %s" % ", ".join(missing))
+	
+	ready = ReadySteps(graph)
+	completions = Queue() # filled from the pool's result handler thread
+	pending = {} # name -> AsyncResult, for tasks that have been started but not completed
+	
+	def submit(name):
+		kwargs = {"callback": completions.put}
+		if sys.version_info[0] >= 3:
+			# failures inside the pool itself (e.g. a task or its result that cannot be pickled) never reach
+			# _timed_call; report them as a failed completion rather than leaving the loop below waiting
+			kwargs["error_callback"] = lambda e: completions.put((name, None, None, None, e))
+		pending[name] = pool.apply_async(_timed_call, ((name, tasks[name]),), **kwargs)
+	
+	def next_completion():
+		while True:
+			try:
+				return completions.get(timeout=0.1)
+			except Empty:
+				# fallback for pythons without error_callback: look for tasks the pool has given up on
+				for name, async_result in list(pending.items()):
+					if async_result.ready() and not async_result.successful():
+						async_result.get() # re-raises the pool's exception
+	
+	pool = multiprocessing.Pool(num_workers) if processes else multiprocessing.pool.ThreadPool(num_workers)
+	order, timings, results = [], {}, {}
+	started = time.time()
+	try:
+		while ready or pending:
+			while ready and len(pending) < num_workers:
+				submit(graph.names[ready.pop()])
+			
+			name, start, end, result, exception = next_completion()
+			del pending[name]
+			if exception is not None:
+				raise exception
+			order.append(name)
+			timings[name] = (start - started, end - started)
+			results[name] = result
+			ready.complete(graph.index[name])
+	finally:
+		pool.terminate()
+		pool.join()
+	
+	ready.check_all_completed()
+	return ExecutionReport(num_workers, order, timings, results, time.time() - started)
+
 class Day7(object):
 	def __init__(self, input_file):
 		with open(input_file, "r") as f:
-			lines = map(lambda L: L.strip(), f.readlines())
+			lines = [L.strip() for L in f.readlines()]
 		self.lines = lines
 	
+	def edges(self):
+		for line in self.lines:
+			match = re.match(r"^Step (\w+) must be finished before step (\w+) can begin.$", line)
+			if not match: raise ValueError("bad input line")
+			yield match.group(1), match.group(2)
+	
+	def step_graph(self, work_offset=0):
+		return StepGraph(self.edges(), work_offset=work_offset)
+	
 	def build_nodes(self, work_offset=0):
 		nodes = {} # name -> node
 		for line in self.lines:
@@ -89,8 +346,8 @@ class Day7(object):
 			# predecessor -> successor
 			pred_name = match.group(1)
 			succ_name = match.group(2)
-			pred = nodes.get(pred_name, Node(pred_name, work=(work_offset + (ord(pred_name)-ord("A")) + 1)))
-			succ = nodes.get(succ_name, Node(succ_name, work=(work_offset + (ord(succ_name)-ord("A")) + 1)))
+			pred = nodes.get(pred_name, Node(pred_name, work=(work_offset + step_number(pred_name))))
+			succ = nodes.get(succ_name, Node(succ_name, work=(work_offset + step_number(succ_name))))
 			
 			pred.follow_by(succ)
 			
@@ -100,6 +357,20 @@ class Day7(object):
 		return nodes
 
 	def part1(self):
+		graph = self.step_graph()
+		roots = graph.roots()
+		print("found %d root node(s): %s" % (len(roots), ", ".join(roots)))
+		return "".join(graph.topological_order())
+	
+	def part2(self, num_workers=5, work_offset=60):
+		graph = self.step_graph(work_offset=work_offset)
+		roots = graph.roots()
+		print("found %d root node(s): %s" % (len(roots), ", ".join("%s(work=%d)" % (name, graph.work[graph.index[name]]) for name in roots)))
+		order, time_taken = graph.schedule(num_workers)
+		print("pool took %d ticks to complete all nodes" % time_taken)
+		return "".join(order)
+	
+	def part1_bruteforce(self):
 		# maintain a stack of nodes that are available for processing, starting with
 		# nodes that have no prerequisites. prior to handling each one,
 		# sort the available stack alphabetically by node name.
@@ -125,7 +396,7 @@ class Day7(object):
 		
 		return result
 	
-	def part2(self):
+	def part2_bruteforce(self):
 		# maintain a stack of nodes that are available for processing, starting with
 		# nodes that have no prerequisites. prior to assigning available nodes to workers,
 		# sort them alphabetically first.
@@ -154,8 +425,15 @@ class Day7(object):
 		
 		print("pool took %d ticks to complete all nodes" % worker_pool.ticks_taken)
 		return result
+	
+	def execute(self, tasks, num_workers=5, processes=False):
+		return execute_graph(self.step_graph(), tasks, num_workers, processes)
+	
+	def part2_sweep(self, max_workers=26, work_offset=60, processes=None):
+		return sweep_workers(self.step_graph(work_offset=work_offset), max_workers, processes)
 
 if __name__ == "__main__":
 	day = Day7("day7.txt")
 	print(day.part1())
-	print(day.part2())
\ No newline at end of file
+	print(day.part2())
+	print(day.part2_sweep())
\ No newline at end of file
@@ -45,11 +45,59 @@ class Node(object):
 				result += self.children[index].value()
 		return result
 
+def iter_tokens(input_file, block_size=1<<16):
+	# yields the whitespace-separated integers in the given file, reading it a block at a time
+	with open(input_file, "r") as f:
+		partial = ""
+		for block in iter(lambda: f.read(block_size), ""):
+			tokens = (partial + block).split()
+			if block[-1:].isspace():
+				partial = ""
+			else:
+				partial = tokens.pop() if tokens else ""
+			for token in tokens:
+				yield int(token)
+		if partial:
+			yield int(partial)
+
+def evaluate_license(tokens):
+	# computes (metadata sum, root value) in a single pass over the integer stream, with an explicit stack
+	# instead of recursion and without building the tree. each stack entry is one node whose children are
+	# still being read: [number of children, number of metadata entries, values of the children read so far],
+	# so memory is bounded by the depth of the tree (times its fan-out), not by the number of nodes.
+	tokens = iter(tokens)
+	metadata_sum = 0
+	try:
+		stack = [[next(tokens), next(tokens), []]]
+		while True:
+			num_children, num_metadata, child_values = stack[-1]
+			if len(child_values) < num_children:
+				stack.append([next(tokens), next(tokens), []])
+				continue
+			
+			metadata = [next(tokens) for i in range(0, num_metadata)]
+			metadata_sum += sum(metadata)
+			if not child_values:
+				value = sum(metadata)
+			else:
+				value = sum(child_values[md-1] for md in metadata if 1 <= md <= len(child_values))
+			
+			stack.pop()
+			if not stack:
+				break
+			stack[-1][2].append(value)
+	except StopIteration:
+		raise ValueError("license data ends before the tree is complete")
+	
+	if next(tokens, None) is not None:
+		raise ValueError("unexpected data after the root node")
+	return metadata_sum, value
+
 class Day8(object):
 	def __init__(self, input_file):
 		with open(input_file, "r") as f:
 			data = f.read().split(" ")
-		self.data = map(int, data)
+		self.data = [int(d) for d in data]
 		self.root = Node.parse(self.data)
 	
 	def part1(self):
@@ -61,4 +109,5 @@ class Day8(object):
 if __name__ == "__main__":
 	day = Day8("day8.txt")
 	print(day.part1())
-	print(day.part2())
\ No newline at end of file
+	print(day.part2())
+	print(evaluate_license(iter_tokens("day8.txt")))
\ No newline at end of file